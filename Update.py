@@ -13,13 +13,21 @@ Simple Windows‑friendly updater for npm & selected global CLIs.
 - https://github.com/wbdb/npm-updater-ai-cli
 """
 
+import atexit
+import concurrent.futures
+import functools
 import json
 import os
 import re
 import shutil
 import subprocess
 import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
 from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
 
 # =============================
 # Settings
@@ -34,17 +42,54 @@ PACKAGES = [
     ("OpenAI Codex CLI", ["@openai/codex", "openai"]),
 ]
 
-# Disable "looking for funding" noise
-os.environ.setdefault("NPM_CONFIG_FUND", "false")
-os.environ.setdefault("npm_config_fund", "false")
+# Shared child environment, built once: disables "looking for funding"
+# noise plus npm's audit and update-notifier phases, and avoids re-copying
+# os.environ for every subprocess call.
+_RUN_ENV: Dict[str, str] = {
+    **os.environ,
+    "NPM_CONFIG_FUND": "false",
+    "npm_config_fund": "false",
+    "NPM_CONFIG_AUDIT": "false",
+    "NPM_CONFIG_UPDATE_NOTIFIER": "false",
+}
+
+# =============================
+# Output
+# =============================
+
+class Reporter:
+    """Collects output lines and writes them with one syscall per flush."""
+
+    def __init__(self, quiet: bool = False) -> None:
+        self.quiet = quiet
+        self._buf: List[str] = []
+
+    def log(self, msg: str = "") -> None:
+        if not self.quiet:
+            self._buf.append(msg)
+
+    def flush(self) -> None:
+        if self._buf:
+            sys.stdout.write("\n".join(self._buf) + "\n")
+            sys.stdout.flush()
+            self._buf.clear()
+
+
+reporter = Reporter(quiet="--quiet" in sys.argv[1:])
+atexit.register(reporter.flush)
 
 # =============================
 # npm / process helpers
 # =============================
 
+# resolved once — shutil.which walks and stats every PATH entry, and the
+# executable does not move while we run
+_NPM_EXE: str = shutil.which("npm") or shutil.which("npm.cmd") or "npm"
+
+
 def npm_exe() -> str:
     """Resolve npm executable (Windows: npm.cmd)."""
-    return shutil.which("npm") or shutil.which("npm.cmd") or "npm"
+    return _NPM_EXE
 
 
 def run(cmd: List[str]) -> Tuple[int, str, str]:
@@ -55,7 +100,7 @@ def run(cmd: List[str]) -> Tuple[int, str, str]:
             capture_output=True,
             text=True,
             check=False,
-            env=os.environ,
+            env=_RUN_ENV,
         )
         return proc.returncode, (proc.stdout or "").strip(), (proc.stderr or "").strip()
     except FileNotFoundError:
@@ -64,6 +109,7 @@ def run(cmd: List[str]) -> Tuple[int, str, str]:
 
 def pause_end() -> None:
     if PAUSE_AT_END:
+        reporter.flush()
         try:
             input("\nPress Enter to exit … ")
         except EOFError:
@@ -72,7 +118,7 @@ def pause_end() -> None:
 
 def ensure_npm() -> None:
     if shutil.which("npm") is None and shutil.which("npm.cmd") is None:
-        print("npm not found. Please install Node.js/npm or restart the shell.")
+        reporter.log("npm not found. Please install Node.js/npm or restart the shell.")
         pause_end()
         sys.exit(2)
 
@@ -80,16 +126,70 @@ def ensure_npm() -> None:
 # Version logic
 # =============================
 
+_NPM_GLOBAL_ROOT: Optional[str] = None
+
+
+def npm_global_root() -> Optional[str]:
+    """Resolve (and cache) npm's global node_modules directory."""
+    global _NPM_GLOBAL_ROOT
+    if _NPM_GLOBAL_ROOT is None:
+        rc, out, err = run([npm_exe(), "root", "-g"])
+        _NPM_GLOBAL_ROOT = out.strip() if rc == 0 and out else ""
+    return _NPM_GLOBAL_ROOT or None
+
+
+def _read_package_version(pkg_dir: str) -> Optional[Tuple[str, str]]:
+    """Read (name, version) from a package directory's package.json."""
+    try:
+        with open(os.path.join(pkg_dir, "package.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    name, ver = meta.get("name"), meta.get("version")
+    if isinstance(name, str) and isinstance(ver, str):
+        return name, ver
+    return None
+
+
+def _scan_global_packages(root: str) -> Dict[str, str]:
+    """Walk <root> one level deep and collect {name: version} off disk."""
+    result: Dict[str, str] = {}
+    for entry in os.scandir(root):
+        if not entry.is_dir() or entry.name.startswith('.'):
+            continue
+        if entry.name.startswith('@'):
+            # scoped packages live one level deeper (@scope/name)
+            for sub in os.scandir(entry.path):
+                if sub.is_dir():
+                    info = _read_package_version(sub.path)
+                    if info:
+                        result[info[0]] = info[1]
+        else:
+            info = _read_package_version(entry.path)
+            if info:
+                result[info[0]] = info[1]
+    return result
+
+
 def get_installed_global_map() -> Dict[str, str]:
     """Return global packages as {name: version}."""
-    rc, out, err = run([npm_exe(), "ls", "-g", "--depth=0", "--json"])
+    # a shallow top-level read only needs the package.json files — skip the
+    # Node startup and dependency-graph walk that 'npm ls -g' pays for
+    root = npm_global_root()
+    if root:
+        try:
+            return _scan_global_packages(root)
+        except OSError:
+            pass  # unexpected layout → let npm enumerate instead
+    rc, out, err = run([npm_exe(), "ls", "-g", "--depth=0", "--json",
+                        "--no-audit", "--no-fund", "--no-progress"])
     if rc != 0 and err:
-        print(f"Warning: could not read global package list: {err}")
+        reporter.log(f"Warning: could not read global package list: {err}")
         return {}
     try:
         data = json.loads(out or '{}')
     except json.JSONDecodeError:
-        print("Warning: unexpected output from 'npm ls -g --json'.")
+        reporter.log("Warning: unexpected output from 'npm ls -g --json'.")
         return {}
     deps = data.get("dependencies", {}) if isinstance(data, dict) else {}
     result: Dict[str, str] = {}
@@ -99,7 +199,96 @@ def get_installed_global_map() -> Dict[str, str]:
     return result
 
 
+REGISTRY_URL = "https://registry.npmjs.org"
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "npm-updater-cache")
+CACHE_TTL_SECONDS = 600  # trust cached versions this long without any network
+
+
+def _cache_path(pkg: str) -> str:
+    return os.path.join(CACHE_DIR, re.sub(r"[^A-Za-z0-9._-]", "_", pkg) + ".json")
+
+
+def _cache_read(pkg: str) -> Optional[Dict[str, object]]:
+    try:
+        with open(_cache_path(pkg), "r", encoding="utf-8") as f:
+            entry = json.load(f)
+        return entry if isinstance(entry, dict) else None
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def _cache_write(pkg: str, entry: Dict[str, object]) -> None:
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(_cache_path(pkg), "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+    except OSError:
+        pass  # cache is best-effort
+
+
+def _registry_latest(pkg: str) -> Optional[str]:
+    """Ask the npm registry directly for the latest version (no subprocess).
+
+    Results are cached on disk; within CACHE_TTL_SECONDS the network is
+    skipped entirely, and afterwards conditional requests (If-None-Match /
+    If-Modified-Since) let the registry answer 304 without a body.
+    """
+    cached = _cache_read(pkg)
+    if cached and isinstance(cached.get("version"), str):
+        fetched_at = cached.get("fetched_at")
+        if isinstance(fetched_at, (int, float)) and time.time() - fetched_at < CACHE_TTL_SECONDS:
+            return cached["version"]
+
+    url = f"{REGISTRY_URL}/{quote(pkg, safe='@')}/latest"
+    req = urllib.request.Request(url)
+    if cached:
+        if isinstance(cached.get("etag"), str):
+            req.add_header("If-None-Match", cached["etag"])
+        if isinstance(cached.get("last_modified"), str):
+            req.add_header("If-Modified-Since", cached["last_modified"])
+    try:
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            headers = resp.headers
+            data = json.loads(resp.read().decode("utf-8"))
+    except urllib.error.HTTPError as e:
+        if e.code == 304 and cached and isinstance(cached.get("version"), str):
+            cached["fetched_at"] = time.time()
+            _cache_write(pkg, cached)
+            return cached["version"]
+        return None
+    except (urllib.error.URLError, OSError, json.JSONDecodeError, ValueError):
+        return None
+    ver = data.get("version") if isinstance(data, dict) else None
+    if not isinstance(ver, str):
+        return None
+    ver = ver.strip()
+    _cache_write(pkg, {
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+        "version": ver,
+        "fetched_at": time.time(),
+    })
+    return ver
+
+
+def get_local_npm_version() -> Optional[str]:
+    """Installed npm version, read from its package.json (no Node startup)."""
+    root = npm_global_root()
+    if root:
+        info = _read_package_version(os.path.join(root, "npm"))
+        if info:
+            return info[1]
+    rc, out, err = run([npm_exe(), "-v"])
+    return out.strip() if rc == 0 and out else None
+
+
+@functools.lru_cache(maxsize=None)
 def get_latest_version(pkg: str) -> Optional[str]:
+    # cached per run: PACKAGES entries may share candidate aliases
+    # direct registry GET skips the Node/npm startup cost entirely
+    v = _registry_latest(pkg)
+    if v:
+        return v
     rc, out, err = run([npm_exe(), "view", pkg, "version", "--json"])
     if rc == 0 and out:
         try:
@@ -112,6 +301,92 @@ def get_latest_version(pkg: str) -> Optional[str]:
     return None
 
 
+def get_latest_versions_bulk(pkgs: List[str]) -> Optional[Dict[str, Optional[str]]]:
+    """Fetch latest versions for several packages with one 'npm view' call.
+
+    npm returns a bare string for a single spec and {name: version} for
+    multiple specs. Returns None when the call itself fails (e.g. one of
+    the names does not exist), so callers can fall back to per-package
+    lookups.
+    """
+    if not pkgs:
+        return {}
+    rc, out, err = run([npm_exe(), "view", *pkgs, "version", "--json"])
+    if rc != 0 or not out:
+        return None
+    try:
+        data = json.loads(out)
+    except json.JSONDecodeError:
+        return None
+    result: Dict[str, Optional[str]] = {p: None for p in pkgs}
+    if isinstance(data, str):
+        if len(pkgs) == 1:
+            result[pkgs[0]] = data.strip()
+    elif isinstance(data, dict):
+        for name, ver in data.items():
+            if name in result and isinstance(ver, str):
+                result[name] = ver.strip()
+    return result
+
+
+def fetch_latest_versions(names: List[str]) -> Dict[str, Optional[str]]:
+    """Fetch latest registry versions for all names, as few calls as possible."""
+    unique = list(dict.fromkeys(names))
+    if not unique:
+        return {}
+    # direct registry GETs, overlapped via threads — no subprocess involved
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(8, len(unique))) as pool:
+        results = pool.map(_registry_latest, unique)
+    latest = dict(zip(unique, results))
+    # registry unreachable (offline/proxy-only setups) → one batched 'npm view'
+    misses = [n for n, v in latest.items() if v is None]
+    if misses:
+        bulk = get_latest_versions_bulk(misses)
+        if bulk:
+            latest.update({n: v for n, v in bulk.items() if v})
+    return latest
+
+
+def get_latest_npm_version() -> Optional[str]:
+    """Latest npm version via the cached registry path, no JSON plumbing.
+
+    The fallback runs 'npm view npm version' without --json: the output
+    is a bare version string, so there is nothing to parse or strip.
+    """
+    v = _registry_latest("npm")
+    if v:
+        return v
+    rc, out, err = run([npm_exe(), "view", "npm", "version"])
+    return out.strip() if rc == 0 and out else None
+
+
+def get_outdated_global() -> Optional[Dict[str, Tuple[str, str]]]:
+    """Return out-of-date global packages as {name: (current, latest)}.
+
+    One 'npm outdated -g --json' call batches every registry comparison
+    inside npm itself. Returns None when the call failed so callers can
+    fall back to per-package lookups. Note: npm exits non-zero when
+    anything is outdated, so only the output shape is trusted — a failed
+    call reports {"error": {...}} on stdout (or nothing at all).
+    """
+    rc, out, err = run([npm_exe(), "outdated", "-g", "--json"])
+    if rc != 0 and not out:
+        return None
+    try:
+        data = json.loads(out or '{}')
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, dict) or "error" in data:
+        return None
+    result: Dict[str, Tuple[str, str]] = {}
+    for name, info in data.items():
+        if isinstance(info, dict) and isinstance(info.get("latest"), str):
+            cur = info.get("current")
+            result[name] = (cur if isinstance(cur, str) else "", info["latest"])
+    return result
+
+
+@functools.lru_cache(maxsize=256)
 def parse_semver(v: str) -> Tuple[int, int, int, str]:
     core, _, pre = (v or "").partition('-')
     parts = core.split('.')
@@ -124,59 +399,103 @@ def parse_semver(v: str) -> Tuple[int, int, int, str]:
     return (M, m, p, pre or '~')
 
 
+@functools.lru_cache(maxsize=256)
+def semver_key(v: str) -> int:
+    """Pack a version into one int so comparisons are a single compare.
+
+    Layout: major<<42 | minor<<22 | patch<<2 | release-bit, where the
+    release bit is 0 for prereleases (1.2.3-rc.1 < 1.2.3).
+    """
+    M, m, p, pre = parse_semver(v)
+    return (M << 42) | (m << 22) | (p << 2) | (1 if pre == '~' else 0)
+
+
 def is_outdated(local: Optional[str], latest: Optional[str]) -> bool:
     if latest is None:
         return False
     if local is None:
         return True
-    return parse_semver(local) < parse_semver(latest)
+    return semver_key(local) < semver_key(latest)
 
 # =============================
 # Update actions
 # =============================
 
-_CHANGED_RE = re.compile(r"changed\s+(\d+)\s+packages?(?:.*?in\s+([0-9.]+\w+))?", re.IGNORECASE | re.DOTALL)
+# bytes pattern, no DOTALL: the summary sits on one line, and matching raw
+# bytes skips decoding npm's (potentially large) output up front
+_CHANGED_RE = re.compile(rb"changed\s+(\d+)\s+packages?(?:[^\n]*?in\s+([0-9.]+\w+))?", re.IGNORECASE)
 
 
-def install_or_update(pkg: str) -> Tuple[bool, int, Optional[str]]:
-    """Install/Update a package. Returns (success, changed_count, time_str)."""
-    print("Installing/updating …")
-    rc, out, err = run([npm_exe(), "install", "-g", pkg])
-    if rc == 0:
-        changed, t = 0, None
-        if out:
-            m = _CHANGED_RE.search(out)
+def install_or_update(pkgs: List[str]) -> Tuple[bool, int, Optional[str]]:
+    """Install/Update packages (one npm call for all of them).
+
+    Returns (success, changed_count, time_str).
+    """
+    reporter.log("Installing/updating …")
+    reporter.flush()  # installs take a while — show progress so far now
+    cmd = [npm_exe(), "install", "-g", *pkgs,
+           "--no-audit", "--no-fund", "--no-progress", "--prefer-offline"]
+    try:
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            env=_RUN_ENV,
+        )
+    except FileNotFoundError:
+        reporter.log("Update failed:")
+        reporter.log(f"Command not found: {cmd[0]}")
+        return False, 0, None
+
+    # stream output instead of buffering it all: the summary line can be
+    # parsed the moment it appears, and memory stays flat on big installs
+    changed, t = 0, None
+    matched = False
+    tail: List[bytes] = []  # last few raw lines, shown if the install fails
+    assert proc.stdout is not None
+    for line in proc.stdout:
+        line = line.rstrip(b"\r\n")
+        tail.append(line)
+        if len(tail) > 20:
+            tail.pop(0)
+        if not matched:
+            m = _CHANGED_RE.search(line)
             if m:
+                matched = True
                 try:
                     changed = int(m.group(1))
                 except Exception:
                     changed = 0
-                if len(m.groups()) >= 2:
-                    t = m.group(2)
-        print("Done.")
+                if m.group(2):
+                    t = m.group(2).decode("ascii", "replace")
+    rc = proc.wait()
+
+    if rc == 0:
+        reporter.log("Done.")
         if t:
-            print(f"Changed packages: {changed} (in {t})")
+            reporter.log(f"Changed packages: {changed} (in {t})")
         else:
-            print(f"Changed packages: {changed}")
+            reporter.log(f"Changed packages: {changed}")
         return True, changed, t
-    print("Update failed:")
-    if err:
-        print(err)
-    elif out:
-        print(out)
+    reporter.log("Update failed:")
+    for line in tail:
+        reporter.log(line.decode("utf-8", "replace"))
     return False, 0, None
 
 
 def maybe_confirm(action: str) -> None:
     if CONFIRM_BEFORE_UPDATE:
+        reporter.flush()
         try:
             input(f"{action} – press Enter to confirm … ")
         except EOFError:
             pass
 
 
-def update_target(display: str, candidates: List[str], installed_map: Dict[str, str]) -> None:
-    print(f"\n— {display} —")
+def update_target(display: str, candidates: List[str], installed_map: Dict[str, str],
+                  latest_map: Dict[str, Optional[str]]) -> Optional[Tuple[str, str]]:
+    """Report status for one target; return (registry_name, latest) if it needs updating."""
+    reporter.log(f"\n— {display} —")
 
     # find installed version (any candidate)
     installed_ver: Optional[str] = None
@@ -187,50 +506,61 @@ def update_target(display: str, candidates: List[str], installed_map: Dict[str,
             installed_ver = installed_map[cand]
             break
 
-    # determine registry candidate + latest version (first hit)
     latest_ver: Optional[str] = None
     chosen_registry_name: Optional[str] = None
-    for cand in candidates:
-        v = get_latest_version(cand)
+
+    # fast path: the installed candidate is authoritative — if it is already
+    # current there is no need to probe the remaining aliases at all
+    if installed_name is not None:
+        v = latest_map.get(installed_name) or get_latest_version(installed_name)
         if v:
-            chosen_registry_name = cand
+            chosen_registry_name = installed_name
             latest_ver = v
-            break
+            if not is_outdated(installed_ver, v):
+                reporter.log(f"Current {display} version: {installed_ver}")
+                reporter.log(f"Latest {display} version: {v}")
+                reporter.log("Already up to date.")
+                return
 
-    print(f"Current {display} version: {installed_ver if installed_ver else 'Not installed'}")
-    print(f"Latest {display} version: {latest_ver if latest_ver else 'Unknown'}")
+    # determine registry candidate + latest version (first hit)
+    if chosen_registry_name is None:
+        for cand in candidates:
+            v = latest_map.get(cand)
+            if v:
+                chosen_registry_name = cand
+                latest_ver = v
+                break
+
+    reporter.log(f"Current {display} version: {installed_ver if installed_ver else 'Not installed'}")
+    reporter.log(f"Latest {display} version: {latest_ver if latest_ver else 'Unknown'}")
 
     if chosen_registry_name is None:
-        print("Warning: could not resolve latest registry version. Check package name.")
+        reporter.log("Warning: could not resolve latest registry version. Check package name.")
         return
 
     if is_outdated(installed_ver, latest_ver):
         maybe_confirm("Update required")
-        ok, changed, t = install_or_update(chosen_registry_name)
-        if ok:
-            new_map = get_installed_global_map()
-            print(f"Now installed: {display} {new_map.get(chosen_registry_name, 'Unknown')}")
-    else:
-        print("Already up to date.")
+        reporter.log("Update queued.")
+        return chosen_registry_name, latest_ver
+    reporter.log("Already up to date.")
+    return None
 
 
-def update_npm_if_needed() -> None:
-    print("\n— npm itself —")
-    rc, out, err = run([npm_exe(), "-v"])  # local npm version
-    local = out.strip() if rc == 0 else None
-    latest = get_latest_version("npm")
-    print(f"Current npm version: {local if local else 'Unknown'}")
-    print(f"Latest npm version: {latest if latest else 'Unknown'}")
+def update_npm_if_needed(latest_map: Dict[str, Optional[str]]) -> None:
+    reporter.log("\n— npm itself —")
+    local = get_local_npm_version()
+    latest = latest_map.get("npm") or get_latest_npm_version()
+    reporter.log(f"Current npm version: {local if local else 'Unknown'}")
+    reporter.log(f"Latest npm version: {latest if latest else 'Unknown'}")
 
     if is_outdated(local, latest):
         maybe_confirm("npm update required")
-        ok, changed, t = install_or_update("npm@latest")
+        ok, changed, t = install_or_update(["npm@latest"])
         if ok:
-            rc2, out2, _ = run([npm_exe(), "-v"])  # re-read
-            newv = out2.strip() if rc2 == 0 else 'Unknown'
-            print(f"npm updated to {newv}")
+            newv = get_local_npm_version() or 'Unknown'
+            reporter.log(f"npm updated to {newv}")
     else:
-        print("npm is current.")
+        reporter.log("npm is current.")
 
 # =============================
 # Main
@@ -239,26 +569,62 @@ def update_npm_if_needed() -> None:
 def main() -> None:
     ensure_npm()
 
-    print("\nnpm CLI Updater")
-    print("This script checks global npm installations and updates when needed.")
+    reporter.log("\nnpm CLI Updater")
+    reporter.log("This script checks global npm installations and updates when needed.")
+
+    # the 'npm outdated' subprocess and the node_modules disk scan are
+    # independent — submit both, then reap, so the slow one hides the other
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as pool:
+        outdated_future = pool.submit(get_outdated_global)
+        installed_map = get_installed_global_map()
+        outdated = outdated_future.result()
+
+    if outdated is not None:
+        # happy path: npm already compared every installed global against the
+        # registry in one batch — only packages that are not installed at all
+        # still need a registry lookup before we can offer to install them
+        missing = [c for _, cands in PACKAGES
+                   if not any(x in installed_map for x in cands)
+                   for c in cands]
+        latest_map: Dict[str, Optional[str]] = fetch_latest_versions(missing)
+        for name, (_cur, latest) in outdated.items():
+            latest_map[name] = latest
+        for name, ver in installed_map.items():
+            latest_map.setdefault(name, ver)  # installed and not outdated ⇒ current
+        latest_map.setdefault("npm", get_local_npm_version())
+    else:
+        # prefetch all registry versions concurrently (network latency dominates)
+        all_candidates = [c for _, cands in PACKAGES for c in cands]
+        latest_map = fetch_latest_versions(all_candidates + ["npm"])
 
     if AUTO_UPDATE_NPM:
-        update_npm_if_needed()
-
-    installed_map = get_installed_global_map()
+        update_npm_if_needed(latest_map)
 
+    pending: List[Tuple[str, str, str]] = []  # (display, registry name, latest)
     for display, candidates in PACKAGES:
-        update_target(display, candidates, installed_map)
+        needed = update_target(display, candidates, installed_map, latest_map)
+        if needed:
+            pending.append((display, needed[0], needed[1]))
+
+    if pending:
+        # one npm invocation for every queued target: the Node/npm warm-up
+        # cost is paid once instead of once per package
+        reporter.log()
+        ok, changed, t = install_or_update([name for _, name, _ in pending])
+        if ok:
+            for display, name, latest in pending:
+                installed_map[name] = latest
+                reporter.log(f"Now installed: {display} {latest}")
 
-    print("\nDone")
-    print("All packages were checked.")
+    reporter.log("\nDone")
+    reporter.log("All packages were checked.")
 
 
 if __name__ == "__main__":
     try:
         main()
     except KeyboardInterrupt:
-        print("Aborted by user.")
+        reporter.log("Aborted by user.")
         sys.exit(130)
     finally:
         pause_end()